@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# The running-sum kernels (window_sums, rolling_std) live in src/_stats.py and
+# are shared with the pipeline rather than kept as a second copy here
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'src'))
+from _stats import rolling_std, window_sums  # noqa: E402
+
+# Index and sectors shared by the archive analysis scripts
+TICKERS = {
+    'Nifty 50': '^NSEI',
+    'Nifty Bank': '^NSEBANK',
+    'Nifty IT': '^CNXIT'
+}
+
+# yfinance downloads are cached here and reused for a day
+CACHE_DIR = Path('cache')
+CACHE_MAX_AGE = 24 * 60 * 60
+
+# Trading days per year, for annualising daily volatility
+SQRT_252 = np.sqrt(252)
+
+@functools.lru_cache(maxsize=None)
+def download_closes(symbols, period=None, start=None, end=None):
+    """Downloads close prices for `symbols` by period or start/end, reusing a local parquet copy if it is less than a day old."""
+    key = hashlib.sha1(repr((symbols, period, start, end)).encode()).hexdigest()[:16]
+    path = CACHE_DIR / f'{key}.parquet'
+    if path.exists() and time.time() - path.stat().st_mtime < CACHE_MAX_AGE:
+        return pd.read_parquet(path, engine='pyarrow')
+
+    import yfinance as yf
+    if period is not None:
+        data = yf.download(list(symbols), period=period, progress=False)
+    else:
+        data = yf.download(list(symbols), start=start, end=end, progress=False)
+
+    # Handle MultiIndex columns from yfinance (Price, Ticker)
+    if isinstance(data.columns, pd.MultiIndex):
+        try:
+            data = data['Adj Close']
+        except KeyError:
+            data = data['Close']
+    elif 'Adj Close' in data.columns or 'Close' in data.columns:
+        # Older yfinance returns a flat OHLCV frame for a single symbol
+        close = 'Adj Close' if 'Adj Close' in data.columns else 'Close'
+        data = data[[close]].rename(columns={close: symbols[0]})
+
+    if not data.empty:
+        CACHE_DIR.mkdir(exist_ok=True)
+        data.to_parquet(path, engine='pyarrow', compression='zstd')
+    return data
+
+def get_prices(tickers, period):
+    """Returns aligned close prices for a {name: symbol} mapping, columns renamed to the names.
+
+    Rows with any missing close are dropped so every series shares one calendar.
+    """
+    data = download_closes(tuple(tickers.values()), period)
+    # Chained, so the cached download is never modified in place
+    inv_tickers = {v: k for k, v in tickers.items()}
+    return data.rename(columns=inv_tickers).dropna()
+
+@functools.lru_cache(maxsize=None)
+def _cached_returns(items, period):
+    prices = get_prices(dict(items), period)
+    if prices.empty:
+        return prices
+    return daily_returns(prices)
+
+def get_returns(tickers, period):
+    """Daily returns for a {name: symbol} mapping, memoised per process on top of the price cache."""
+    return _cached_returns(tuple(tickers.items()), period)
+
+def daily_returns(df):
+    """Computes simple daily returns for every column in a single NumPy pass."""
+    prices = df.to_numpy(dtype=np.float64, copy=False)
+    rets = np.empty_like(prices[1:])
+    np.divide(np.diff(prices, axis=0), prices[:-1], out=rets)
+
+    # Build the NaN mask once instead of a per-column dropna
+    valid = ~np.isnan(rets).any(axis=1)
+    return pd.DataFrame(rets[valid], index=df.index[1:][valid], columns=df.columns)
+
+def rolling_stats(x, window):
+    """Returns the trailing `window` mean and the overall mean of x from one cumulative sum.
+
+    Windows containing a missing value are NaN and the overall mean skips missing
+    values, matching pandas' rolling(window).mean() and mean().
+    """
+    x = np.asarray(x, dtype=np.float64)
+    ok = ~np.isnan(x)
+    cs = np.cumsum(np.where(ok, x, 0.0))
+    cn = np.cumsum(ok)
+
+    win_sum = cs[window - 1:] - np.r_[0.0, cs[:-window]]
+    win_cnt = cn[window - 1:] - np.r_[0, cn[:-window]]
+    mean_roll = np.full(len(x), np.nan)
+    mean_roll[window - 1:] = np.where(win_cnt == window, win_sum / window, np.nan)
+    return mean_roll, cs[-1] / cn[-1]
+
+def rolling_beta_batch(returns, market_idx, window):
+    """Calculates the rolling beta of every column against column `market_idx` in one pass.
+
+    Running sums give cov = (n*Sxy - Sx*Sy) / n(n-1), so each step adds the new
+    row and drops the old one instead of rescanning the whole window.
+    Windows containing a missing pair are NaN, matching pandas' rolling cov.
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    y = x[:, [market_idx]]
+    ok = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(ok, x, 0.0)
+    y = np.where(ok, y, 0.0)
+
+    n = window_sums(ok.astype(np.float64), window)
+    sx = window_sums(x, window)
+    sy = window_sums(y, window)
+    sxy = window_sums(x * y, window)
+    syy = window_sums(y * y, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (n * sxy - sx * sy) / (n * syy - sy * sy)
+    beta[~(n == window)] = np.nan
+    return beta
+
+def lead_lag_corr(x, y, lags):
+    """Correlates y with x shifted by each lag (positive lag = x leads).
+
+    The per-point moments (validity, value, square) are stacked once; each lag is
+    then one small matrix product over the overlapping slices, and Pearson follows
+    in closed form: r = (n*Sxy - Sx*Sy) / sqrt((n*Sxx - Sx^2) * (n*Syy - Sy^2)).
+    Missing values are zero-filled and masked out of the counts, which keeps the
+    calendar alignment and matches pandas' pairwise shift(lag).corr().
+    """
+    n_obs = len(x)
+    x_ok, y_ok = ~np.isnan(x), ~np.isnan(y)
+
+    # Standardise first so the moment sums stay well conditioned
+    x = np.where(x_ok, (x - np.nanmean(x)) / np.nanstd(x), 0.0)
+    y = np.where(y_ok, (y - np.nanmean(y)) / np.nanstd(y), 0.0)
+    mx = np.stack([x_ok, x, x * x]).astype(np.float64)
+    my = np.stack([y_ok, y, y * y]).astype(np.float64).T
+
+    corrs = np.empty(len(lags))
+    for i, k in enumerate(lags):
+        # x[t - k] pairs with y[t] over the overlapping slices
+        s = mx[:, max(0, -k):n_obs - max(0, k)] @ my[max(0, k):n_obs - max(0, -k)]
+        n, sx, sy = s[0, 0], s[1, 0], s[0, 1]
+        sxx, syy, sxy = s[2, 0], s[0, 2], s[1, 1]
+        corrs[i] = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    return corrs
+
+def risk_score(ann_vol):
+    """Volatility-only Risk Score v2 from annualised volatility.
+
+    Readings above 100% are treated as glitches and dropped; the rest are
+    z-scored as 50 + 12 * z and clipped to [0, 100].
+    """
+    vol = np.where(ann_vol > 1.0, np.nan, ann_vol)
+    vol_std = np.nanstd(vol, ddof=1)
+    if vol_std == 0:
+        vol_std = 1e-6
+    return np.clip(50 + 12.0 * (vol - np.nanmean(vol)) / vol_std, 0, 100)
+
+def vol_and_risk(r, window):
+    """Annualised rolling volatility (glitches above 100% masked) and its Risk Score v2."""
+    vol = rolling_std(r, window) * SQRT_252
+    vol[vol > 1.0] = np.nan
+    return vol, risk_score(vol)
@@ -0,0 +1,41 @@
+import matplotlib
+
+# cm.viridis(x) resolved ahead of time for the stops the plots use
+VIRIDIS = {
+    0.1: (0.282623, 0.140926, 0.457517, 1.0),
+    0.3: (0.206756, 0.371758, 0.553117, 1.0),
+    0.5: (0.127568, 0.566949, 0.550556, 1.0),
+    0.8: (0.477504, 0.821444, 0.318195, 1.0),
+    0.9: (0.741388, 0.873449, 0.149561, 1.0),
+}
+
+_APPLIED = False
+
+def headless():
+    """Selects the Agg backend; long date lines go through Agg in bigger chunks and get simplified.
+
+    Only matplotlib itself is loaded here. The analysis scripts import pyplot inside their
+    plot functions, so an empty download exits before pyplot is loaded.
+    """
+    matplotlib.use('Agg')
+    matplotlib.rcParams['agg.path.chunksize'] = 10000
+    matplotlib.rcParams['path.simplify'] = True
+    matplotlib.rcParams['path.simplify_threshold'] = 1.0
+
+def save(output_file, dpi=300):
+    """Lays the current figure out once and saves it at the figure size, with no second tight-bbox render pass."""
+    import matplotlib.pyplot as plt
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches=None, pil_kwargs={'compress_level': 1})
+
+def apply():
+    """Applies the shared whitegrid / talk / viridis style once per process."""
+    global _APPLIED
+    if _APPLIED:
+        return
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('seaborn-v0_8-whitegrid')
+    sns.set_context("talk", font_scale=1.0)
+    sns.set_palette("viridis")
+    _APPLIED = True
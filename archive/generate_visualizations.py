@@ -1,64 +1,131 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
+import pyarrow as pa
+from pyarrow import csv as pacsv
 import os
+from concurrent.futures import ProcessPoolExecutor
+from _common import rolling_beta_batch, lead_lag_corr
+import _plot_style
+from _plot_style import VIRIDIS
 
 # Configuration
 DATA_FILE = "master_market_data_2015_2022_final.csv"
 OUTPUT_DIR = "."
+# Columns the plots read; every *_Return and *_30dRet column is added from the header
+BASE_COLS = ['Date', 'NIFTY_50_Close', 'Vol_30d', 'Risk_Score_v2', 'FII_Net']
 
-# Plotting Style
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_context("talk", font_scale=1.0)
-sns.set_palette("viridis")
-from matplotlib import cm
 
-
-def save_plot(filename):
+def save_plot(fig, filename, dpi=150):
     path = os.path.join(OUTPUT_DIR, filename)
-    plt.savefig(path, dpi=300, bbox_inches='tight')
+    # Fast zlib level; screen-size dpi unless the caller asks for more
+    fig.savefig(path, dpi=dpi, bbox_inches='tight', pil_kwargs={'compress_level': 1, 'optimize': False})
     print(f"Saved: {path}")
-    plt.close()
+    # Reuse the same figure for the next plot instead of tearing it down
+    fig.clear()
 
-def main():
-    print("Loading data...")
-    try:
-        df = pd.read_csv(DATA_FILE)
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date')
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return
+def _lttb(x, y, n_out=800):
+    """Downsamples a gap-free line to n_out points with Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return x, y
 
-    print(f"Data loaded: {len(df)} rows.")
+    xf = x.astype(np.float64)
+    # First and last points are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = xf[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # Pick the point forming the largest triangle with the last pick and the next bucket's mean
+        area = np.abs((xf[a] - cx) * (y[lo:hi] - y[a]) - (xf[a] - xf[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+def _thin(dates, series, n_out=800):
+    """LTTB-downsamples a daily series for plotting and returns datetime x values.
 
-    # 1. NIFTY 50 Close Price
+    Each run of finite values is thinned on its own, with a share of n_out
+    matching its length, and the runs are rejoined with NaN separators so
+    missing days still show as breaks in the line.
+    """
+    x = dates.astype('i8')
+    y = np.asarray(series, dtype=np.float64)
+    ok = np.isfinite(y)
+    # Start/stop indices of every finite run
+    edges = np.flatnonzero(np.diff(np.r_[0, ok.view(np.int8), 0]))
+    total = max(int(ok.sum()), 1)
+
+    xs, ys = [], []
+    for lo, hi in zip(edges[::2], edges[1::2]):
+        if xs:
+            xs.append(x[lo - 1:lo])
+            ys.append(np.array([np.nan]))
+        xr, yr = _lttb(x[lo:hi], y[lo:hi], max(3, round(n_out * (hi - lo) / total)))
+        xs.append(xr)
+        ys.append(yr)
+    if not xs:
+        return x[:0].astype('M8[ns]'), y[:0]
+    return np.concatenate(xs).astype('M8[ns]'), np.concatenate(ys)
+
+def load_data(path):
+    """Reads only the columns the plots use, with types declared up front."""
+    names = pacsv.open_csv(path).schema.names
+    used = [c for c in names if c in BASE_COLS or c.endswith('_Return') or c.endswith('_30dRet')]
+    types = {c: pa.float64() for c in used}
+    types['Date'] = pa.timestamp('ns')
+    table = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(include_columns=used, column_types=types))
+    return table.to_pandas()
+
+# Each worker process keeps one figure, resized and cleared between plots
+_FIG = None
+
+def _figure(width, height):
+    """Returns this process's shared figure, styled and sized for the next plot."""
+    global _FIG
+    _plot_style.apply()
+    if _FIG is None:
+        _FIG = plt.figure(figsize=(width, height))
+    else:
+        _FIG.set_size_inches(width, height)
+    return _FIG
+
+# --- Plots ---
+
+def plot_nifty_close(dates, close):
     print("Generating NIFTY 50 Close plot...")
-    plt.figure(figsize=(14, 6))
-    plt.plot(df['Date'], df['NIFTY_50_Close'], color=cm.viridis(0.3), linewidth=2, label='NIFTY 50')
+    fig = _figure(14, 6)
+    plt.plot(*_thin(dates, close), color=VIRIDIS[0.3], linewidth=2, label='NIFTY 50')
     plt.title('NIFTY 50 Close Price (2015–2025)', fontsize=18, fontweight='bold')
     plt.xlabel('Date', fontsize=14)
     plt.ylabel('Index Level', fontsize=14)
     plt.grid(True, linestyle='--', alpha=0.7)
     plt.legend(loc='upper left')
     plt.tight_layout()
-    save_plot('nifty_50_close_professional.png')
+    save_plot(fig, 'nifty_50_close_professional.png')
 
-    # 2. Volatility vs Risk Score
+def plot_vol_vs_risk(dates, vol30, risk):
     print("Generating Vol vs Risk plot...")
-    fig, ax1 = plt.subplots(figsize=(14, 6))
-    color = cm.viridis(0.3)
+    fig = _figure(14, 6)
+    ax1 = fig.add_subplot()
+    color = VIRIDIS[0.3]
     ax1.set_xlabel('Date', fontsize=14)
     ax1.set_ylabel('Volatility (30d)', color=color, fontsize=14)
-    ax1.plot(df['Date'], df['Vol_30d'], color=color, alpha=0.8, linewidth=1.5, label='Vol 30d')
+    ax1.plot(*_thin(dates, vol30), color=color, alpha=0.8, linewidth=1.5, label='Vol 30d')
     ax1.tick_params(axis='y', labelcolor=color)
     ax1.grid(True, linestyle='--', alpha=0.5)
 
     ax2 = ax1.twinx()
-    color = cm.viridis(0.8)
+    color = VIRIDIS[0.8]
     ax2.set_ylabel('Risk Score v2', color=color, fontsize=14)
-    ax2.plot(df['Date'], df['Risk_Score_v2'], color=color, alpha=0.8, linewidth=1.5, label='Risk Score v2')
+    ax2.plot(*_thin(dates, risk), color=color, alpha=0.8, linewidth=1.5, label='Risk Score v2')
     ax2.tick_params(axis='y', labelcolor=color)
     ax2.grid(False)
 
@@ -67,77 +134,82 @@ def main():
     lines2, labels2 = ax2.get_legend_handles_labels()
     ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
     plt.tight_layout()
-    save_plot('volatility_vs_risk_professional.png')
+    save_plot(fig, 'volatility_vs_risk_professional.png')
 
-    # 3. Sector 30-Day Returns
+def plot_sector_momentum(latest_date, sector_names, values):
     print("Generating Sector Momentum plot...")
-    latest_row = df.dropna(subset=['NIFTY_50_Close']).iloc[-1]
-    sector_cols = [c for c in df.columns if '30dRet' in c]
-    if sector_cols:
-        sector_data = latest_row[sector_cols].sort_values(ascending=False)
-        sector_names = [s.replace('_30dRet', '').replace('NIFTY_', '') for s in sector_data.index]
-        
-        plt.figure(figsize=(14, 8))
-        sns.barplot(x=sector_data.values, y=sector_names, palette="viridis")
-        plt.title(f'Sector 30-Day Momentum (Latest: {latest_row["Date"].date()})', fontsize=18, fontweight='bold')
-        plt.xlabel('30-Day Return', fontsize=14)
-        plt.ylabel('Sector', fontsize=14)
-        plt.grid(True, axis='x', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        save_plot('sector_momentum_professional.png')
+    fig = _figure(14, 8)
+    sns.barplot(x=values, y=sector_names, palette="viridis")
+    plt.title(f'Sector 30-Day Momentum (Latest: {latest_date})', fontsize=18, fontweight='bold')
+    plt.xlabel('30-Day Return', fontsize=14)
+    plt.ylabel('Sector', fontsize=14)
+    plt.grid(True, axis='x', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    save_plot(fig, 'sector_momentum_professional.png')
 
-    # 4. Correlation Matrix
+def plot_correlation(rets, clean_names):
     print("Generating Correlation Matrix...")
-    ret_cols = [c for c in df.columns if '_Return' in c]
-    if ret_cols:
-        corr = df[ret_cols].corr()
-        clean_names = [c.replace('_Return', '').replace('NIFTY_', '') for c in corr.columns]
-        corr.columns = clean_names
-        corr.index = clean_names
-        
-        plt.figure(figsize=(12, 10))
-        sns.heatmap(corr, annot=True, cmap='viridis', fmt=".2f", linewidths=0.5, square=True)
-        plt.title('Sector Return Correlation Matrix', fontsize=18, fontweight='bold')
-        plt.tight_layout()
-        save_plot('sector_correlation_professional.png')
+    # Pearson on complete rows as one matrix product of z-scored returns
+    rets = rets[~np.isnan(rets).any(axis=1)]
+    z = (rets - rets.mean(axis=0)) / rets.std(axis=0, ddof=1)
+    vals = (z.T @ z) / (len(z) - 1)
 
-    # 5. Rolling Beta
+    fig = _figure(12, 10)
+    ax = fig.add_subplot()
+    im = ax.imshow(vals, cmap='viridis')
+    fig.colorbar(im, ax=ax).outline.set_visible(False)
+    n = len(clean_names)
+    ax.set_xticks(range(n), clean_names, rotation=90)
+    ax.set_yticks(range(n), clean_names)
+    # White cell borders on the minor ticks, as the seaborn heatmap drew them
+    ax.grid(False)
+    ax.set_xticks(np.arange(n + 1) - 0.5, minor=True)
+    ax.set_yticks(np.arange(n + 1) - 0.5, minor=True)
+    ax.grid(True, which='minor', color='white', linewidth=0.5)
+    ax.tick_params(which='minor', length=0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    # Dark text on light cells and vice versa, by relative luminance
+    rgb = im.cmap(im.norm(vals))[..., :3]
+    rgb = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    lum = rgb @ [0.2126, 0.7152, 0.0722]
+    for i, j in np.ndindex(vals.shape):
+        ax.text(j, i, f"{vals[i, j]:.2f}", ha='center', va='center',
+                color='#262626' if lum[i, j] > 0.408 else 'white')
+    plt.title('Sector Return Correlation Matrix', fontsize=18, fontweight='bold')
+    plt.tight_layout()
+    save_plot(fig, 'sector_correlation_professional.png', dpi=300)
+
+def plot_rolling_beta(dates, rets, clean_names, window=30):
+    """Plots rolling betas of each return column against the last (market) column."""
     print("Generating Rolling Beta plot...")
-    target_sectors = ['NIFTY_IT', 'NIFTY_BANK', 'NIFTY_FMCG', 'NIFTY_AUTO', 'NIFTY_METAL']
-    window = 30
-    plt.figure(figsize=(14, 6))
-    if 'NIFTY_50_Return' in df.columns:
-        nifty_vol = df['NIFTY_50_Return'].rolling(window).std()
-        for sector in target_sectors:
-            col = f'{sector}_Return'
-            if col in df.columns:
-                sector_vol = df[col].rolling(window).std()
-                corr = df[col].rolling(window).corr(df['NIFTY_50_Return'])
-                beta = corr * (sector_vol / nifty_vol)
-                clean_name = sector.replace('NIFTY_', '')
-                plt.plot(df['Date'], beta, label=clean_name, linewidth=1.5)
-
-        plt.title('30-Day Rolling Beta vs NIFTY 50', fontsize=18, fontweight='bold')
-        plt.xlabel('Date', fontsize=14)
-        plt.ylabel('Beta', fontsize=14)
-        plt.axhline(1.0, color='black', linestyle='--', alpha=0.5, label='Market Beta (1.0)')
-        plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        save_plot('rolling_beta_professional.png')
+    fig = _figure(14, 6)
+    betas = rolling_beta_batch(rets, len(clean_names), window)
+    for i, clean_name in enumerate(clean_names):
+        plt.plot(*_thin(dates, betas[:, i]), label=clean_name, linewidth=1.5)
 
-    # 6. Market Regime Map
+    plt.title('30-Day Rolling Beta vs NIFTY 50', fontsize=18, fontweight='bold')
+    plt.xlabel('Date', fontsize=14)
+    plt.ylabel('Beta', fontsize=14)
+    plt.axhline(1.0, color='black', linestyle='--', alpha=0.5, label='Market Beta (1.0)')
+    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    save_plot(fig, 'rolling_beta_professional.png')
+
+def plot_regime_map(dates, close, risk):
     print("Generating Market Regime Map...")
-    plt.figure(figsize=(14, 6))
-    plt.plot(df['Date'], df['NIFTY_50_Close'], color='black', linewidth=1.5, label='NIFTY 50')
+    fig = _figure(14, 6)
+    plt.plot(*_thin(dates, close), color='black', linewidth=1.5, label='NIFTY 50')
     y_min, y_max = plt.ylim()
-    low_mask = df['Risk_Score_v2'] < 40
-    med_mask = (df['Risk_Score_v2'] >= 40) & (df['Risk_Score_v2'] < 60)
-    high_mask = df['Risk_Score_v2'] >= 60
+    # Bin the score once (0 = low, 1 = medium, 2 = high, -1 = missing)
+    bins = (risk >= 40).astype(np.int8) + (risk >= 60).astype(np.int8)
+    bins[np.isnan(risk)] = -1
     
-    plt.fill_between(df['Date'], y_min, y_max, where=low_mask, color=cm.viridis(0.9), alpha=0.3, label='Low Risk (<40)')
-    plt.fill_between(df['Date'], y_min, y_max, where=med_mask, color=cm.viridis(0.5), alpha=0.3, label='Medium Risk (40-60)')
-    plt.fill_between(df['Date'], y_min, y_max, where=high_mask, color=cm.viridis(0.1), alpha=0.3, label='High Risk (>60)')
+    plt.fill_between(dates, y_min, y_max, where=(bins == 0), color=VIRIDIS[0.9], alpha=0.3, label='Low Risk (<40)')
+    plt.fill_between(dates, y_min, y_max, where=(bins == 1), color=VIRIDIS[0.5], alpha=0.3, label='Medium Risk (40-60)')
+    plt.fill_between(dates, y_min, y_max, where=(bins == 2), color=VIRIDIS[0.1], alpha=0.3, label='High Risk (>60)')
     
     plt.title('Market Risk Regimes (2015–2025)', fontsize=18, fontweight='bold')
     plt.xlabel('Date', fontsize=14)
@@ -145,33 +217,90 @@ def main():
     plt.legend(loc='upper left')
     plt.grid(True, linestyle='--', alpha=0.5)
     plt.tight_layout()
-    save_plot('market_regime_map_professional.png')
+    save_plot(fig, 'market_regime_map_professional.png')
 
-    # 7. FII Lead-Lag
+def plot_fii_lead_lag(fii, rets, clean_names):
     print("Generating FII Lead-Lag plot...")
     lags = range(-10, 11)
+    fig = _figure(14, 6)
+    for i, clean_name in enumerate(clean_names):
+        # Closed-form Pearson per lag, no shifted copies of the column
+        corrs = lead_lag_corr(fii, rets[:, i], lags)
+        plt.plot(lags, corrs, marker='o', label=clean_name)
+    
+    plt.title('FII Flows Lead–Lag Impact on Sector Returns', fontsize=18, fontweight='bold')
+    plt.xlabel('Lag (Days) [Positive = FII Leads]', fontsize=14)
+    plt.ylabel('Correlation', fontsize=14)
+    plt.axvline(0, color='black', linestyle='--', alpha=0.5)
+    plt.axhline(0, color='black', linestyle='-', alpha=0.2)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    save_plot(fig, 'fii_lead_lag_professional.png')
+
+def _dispatch(task):
+    func, args = task
+    return func(*args)
+
+def main():
+    print("Loading data...")
+    try:
+        df = load_data(DATA_FILE)
+        df = df.sort_values('Date')
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return
+
+    print(f"Data loaded: {len(df)} rows.")
+
+    # Pull the shared columns out once as plain ndarrays; each plot gets only what it draws
+    dates = df['Date'].to_numpy()
+    close = df['NIFTY_50_Close'].to_numpy(dtype=np.float64)
+    vol30 = df['Vol_30d'].to_numpy(dtype=np.float64)
+    risk = df['Risk_Score_v2'].to_numpy(dtype=np.float64)
+
+    def returns_of(cols):
+        return df[cols].to_numpy(dtype=np.float64)
+
+    def clean(col, suffix):
+        return col.replace(suffix, '').replace('NIFTY_', '')
+
+    tasks = [
+        (plot_nifty_close, (dates, close)),
+        (plot_vol_vs_risk, (dates, vol30, risk)),
+    ]
+
+    # 3. Sector 30-Day Returns
+    latest_row = df.dropna(subset=['NIFTY_50_Close']).iloc[-1]
+    sector_cols = [c for c in df.columns if '30dRet' in c]
+    if sector_cols:
+        sector_data = latest_row[sector_cols].sort_values(ascending=False)
+        sector_names = [clean(s, '_30dRet') for s in sector_data.index]
+        tasks.append((plot_sector_momentum, (latest_row['Date'].date(), sector_names, sector_data.to_numpy(dtype=np.float64))))
+
+    # 4. Correlation Matrix
+    ret_cols = [c for c in df.columns if '_Return' in c]
+    if ret_cols:
+        tasks.append((plot_correlation, (returns_of(ret_cols), [clean(c, '_Return') for c in ret_cols])))
+
+    # 5. Rolling Beta
+    target_sectors = ['NIFTY_IT', 'NIFTY_BANK', 'NIFTY_FMCG', 'NIFTY_AUTO', 'NIFTY_METAL']
+    if 'NIFTY_50_Return' in df.columns:
+        cols = [f'{sector}_Return' for sector in target_sectors if f'{sector}_Return' in df.columns]
+        tasks.append((plot_rolling_beta, (dates, returns_of(cols + ['NIFTY_50_Return']), [clean(c, '_Return') for c in cols])))
+
+    # 6. Market Regime Map
+    tasks.append((plot_regime_map, (dates, close, risk)))
+
+    # 7. FII Lead-Lag
     sectors_to_test = ['NIFTY_BANK', 'NIFTY_PSU_BANK', 'NIFTY_IT']
-    plt.figure(figsize=(14, 6))
     if 'FII_Net' in df.columns:
-        for sector in sectors_to_test:
-            col = f'{sector}_Return'
-            if col in df.columns:
-                corrs = []
-                for lag in lags:
-                    c = df['FII_Net'].shift(lag).corr(df[col])
-                    corrs.append(c)
-                clean_name = sector.replace('NIFTY_', '')
-                plt.plot(lags, corrs, marker='o', label=clean_name)
-        
-        plt.title('FII Flows Lead–Lag Impact on Sector Returns', fontsize=18, fontweight='bold')
-        plt.xlabel('Lag (Days) [Positive = FII Leads]', fontsize=14)
-        plt.ylabel('Correlation', fontsize=14)
-        plt.axvline(0, color='black', linestyle='--', alpha=0.5)
-        plt.axhline(0, color='black', linestyle='-', alpha=0.2)
-        plt.legend()
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        save_plot('fii_lead_lag_professional.png')
+        cols = [f'{sector}_Return' for sector in sectors_to_test if f'{sector}_Return' in df.columns]
+        tasks.append((plot_fii_lead_lag, (df['FII_Net'].to_numpy(dtype=np.float64), returns_of(cols), [clean(c, '_Return') for c in cols])))
+
+    # The plots share no state, so each renders in its own process
+    with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as ex:
+        list(ex.map(_dispatch, tasks))
 
 if __name__ == "__main__":
     main()
@@ -1,62 +1,23 @@
-import yfinance as yf
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from _common import TICKERS, get_returns, rolling_beta_batch
 
-def fetch_data():
-    """Fetches historical data for Nifty 50 and selected sectors."""
-    tickers = {
-        'Nifty 50': '^NSEI',
-        'Nifty Bank': '^NSEBANK',
-        'Nifty IT': '^CNXIT'
-    }
-    
-    print("Fetching data from yfinance...")
-    data = yf.download(list(tickers.values()), period="2y", progress=False)
-    
-    # Handle MultiIndex columns from yfinance (Price, Ticker)
-    if isinstance(data.columns, pd.MultiIndex):
-        try:
-            data = data['Adj Close']
-        except KeyError:
-            data = data['Close']
-            
-    # Rename columns to friendly names
-    inv_tickers = {v: k for k, v in tickers.items()}
-    data.rename(columns=inv_tickers, inplace=True)
-    
-    # Drop any rows with missing values to ensure alignment
-    data.dropna(inplace=True)
-    return data
-
-def calculate_rolling_beta(df, window=30):
+def calculate_rolling_beta(returns, window=30):
     """Calculates the rolling beta for each column against Nifty 50."""
-    # Calculate daily percent change
-    returns = df.pct_change().dropna()
-    
     market_col = 'Nifty 50'
-    market_returns = returns[market_col]
+    sectors = [c for c in returns.columns if c != market_col]
     
-    betas = pd.DataFrame(index=returns.index)
+    # Rolling covariance / market variance for every sector in one batched pass
+    cols = sectors + [market_col]
+    beta = rolling_beta_batch(returns[cols].to_numpy(), len(sectors), window)[:, :len(sectors)]
     
-    # Calculate rolling variance of the market
-    market_rolling_var = market_returns.rolling(window=window).var()
+    # --- Outlier Cleaning (Crucial Step) ---
+    # Filter or clip beta values. Replace any beta < -2 or > 3 with NaN
+    beta[(beta < -2) | (beta > 3)] = np.nan
     
-    for col in returns.columns:
-        if col == market_col:
-            continue
-            
-        # Calculate rolling covariance between sector and market
-        rolling_cov = returns[col].rolling(window=window).cov(market_returns)
-        
-        # Calculate Beta
-        beta = rolling_cov / market_rolling_var
-        
-        # --- Outlier Cleaning (Crucial Step) ---
-        # Filter or clip beta values. Replace any beta < -2 or > 3 with NaN
-        beta = beta.mask((beta < -2) | (beta > 3))
-        
-        betas[col] = beta
+    betas = pd.DataFrame(beta, index=returns.index, columns=sectors)
         
     return betas
 
@@ -90,14 +51,15 @@ def plot_betas(betas):
 def main():
     try:
         # 1. Data Preparation
-        df = fetch_data()
+        print("Fetching data from yfinance...")
+        returns = get_returns(TICKERS, "2y")
         
-        if df.empty:
+        if returns.empty:
             print("No data fetched. Please check your internet connection or ticker symbols.")
             return
 
         # 2. Calculation Logic & 3. Outlier Cleaning
-        betas = calculate_rolling_beta(df)
+        betas = calculate_rolling_beta(returns)
         
         # 4. Visualization
         plot_betas(betas)
@@ -1,40 +1,10 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from _common import SQRT_252, TICKERS, get_returns
 
-def fetch_data():
-    """Fetches 10 years of historical data for Nifty 50 and selected sectors."""
-    tickers = {
-        'Nifty 50': '^NSEI',
-        'Nifty Bank': '^NSEBANK',
-        'Nifty IT': '^CNXIT'
-    }
-    
-    print("Fetching 10 years of data from yfinance...")
-    # Fetch 10 years of data
-    data = yf.download(list(tickers.values()), period="10y", progress=False)
-    
-    # Handle MultiIndex columns from yfinance (Price, Ticker)
-    if isinstance(data.columns, pd.MultiIndex):
-        try:
-            data = data['Adj Close']
-        except KeyError:
-            data = data['Close']
-            
-    # Rename columns to friendly names
-    inv_tickers = {v: k for k, v in tickers.items()}
-    data.rename(columns=inv_tickers, inplace=True)
-    
-    # Drop any rows with missing values to ensure alignment
-    data.dropna(inplace=True)
-    return data
-
-def calculate_metrics(df, window=30):
+def calculate_metrics(returns, window=30):
     """Calculates annualized rolling volatility and market daily returns."""
-    # Calculate daily percent change
-    returns = df.pct_change().dropna()
-    
     # --- Market Daily Returns (Context) ---
     market_col = 'Nifty 50'
     market_returns = returns[market_col]
@@ -51,7 +21,7 @@ def calculate_metrics(df, window=30):
         rolling_std = returns[col].rolling(window=window).std()
         
         # Annualize it: volatility = rolling_std * (252 ** 0.5)
-        annualized_vol = rolling_std * (252 ** 0.5)
+        annualized_vol = rolling_std * SQRT_252
         
         # Filter out extreme data glitches (volatility > 100% i.e., > 1.0)
         annualized_vol = annualized_vol.mask(annualized_vol > 1.0)
@@ -107,14 +77,15 @@ def plot_volatility(volatility, market_returns):
 def main():
     try:
         # 1. Data Setup
-        df = fetch_data()
+        print("Fetching 10 years of data from yfinance...")
+        returns = get_returns(TICKERS, "10y")
         
-        if df.empty:
+        if returns.empty:
             print("No data fetched. Please check your internet connection or ticker symbols.")
             return
 
         # 2. & 3. Metrics Calculation
-        volatility, market_returns = calculate_metrics(df)
+        volatility, market_returns = calculate_metrics(returns)
         
         # 4. Visualization
         plot_volatility(volatility, market_returns)
@@ -1,8 +1,9 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from _common import SQRT_252, download_closes
+from _plot_style import headless, save
+
+headless()
 
 def fetch_data():
     """Fetches data for Nifty Bank, IT, and Nifty 50."""
@@ -13,20 +14,12 @@ def fetch_data():
     }
     
     print("Fetching data from 2017-01-01 to 2026-11-28...")
-    data = yf.download(list(tickers.values()), start='2017-01-01', end='2026-11-28', progress=False)
-    
-    if isinstance(data.columns, pd.MultiIndex):
-        try:
-            data = data['Adj Close']
-        except KeyError:
-            data = data['Close']
+    data = download_closes(tuple(tickers.values()), start='2017-01-01', end='2026-11-28')
             
-    # Rename columns
+    # Rename columns and drop rows with missing values
+    # (chained, so the cached frame is never modified in place)
     inv_tickers = {v: k for k, v in tickers.items()}
-    data.rename(columns=inv_tickers, inplace=True)
-    
-    # Drop rows with missing values
-    data.dropna(inplace=True)
+    data = data.rename(columns=inv_tickers).dropna()
     return data
 
 def calculate_metrics(df):
@@ -40,7 +33,7 @@ def calculate_metrics(df):
     volatility = pd.DataFrame(index=returns.index)
     for col in ['BANK', 'IT']:
         rolling_std = returns[col].rolling(window=30).std()
-        vol = rolling_std * (252 ** 0.5) * 100 # Convert to %
+        vol = rolling_std * (SQRT_252 * 100) # Convert to %, one scalar multiply
         # Filter extreme glitches (> 100%)
         vol = vol.mask(vol > 100)
         volatility[col] = vol
@@ -49,7 +42,11 @@ def calculate_metrics(df):
 
 def plot_risk_crashes(volatility, market_returns):
     """Generates the dual-axis plot comparing Sector Risk vs Market Crashes."""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    
     # Visual Specifications
+    idx = volatility.index.to_numpy()
     plt.figure(figsize=(14, 6), dpi=300)
     
     # Create Dual Axis
@@ -65,19 +62,24 @@ def plot_risk_crashes(volatility, market_returns):
     # User asked for "Light green bars... light red bars".
     # Let's use fill_between which looks like bars when dense.
     
-    ax2.fill_between(market_returns.index, 0, market_returns, where=(market_returns >= 0), 
-                     color='lightgreen', alpha=0.6, label='Market Return (+)', step='mid')
-    ax2.fill_between(market_returns.index, 0, market_returns, where=(market_returns < 0), 
-                     color='lightcoral', alpha=0.6, label='Market Return (-)', step='mid')
+    # Daily bars can't be resolved at this size anyway, so fill the weekly
+    # extremes (best and worst day of each week); Agg simplifies the paths
+    mr_pos = market_returns.clip(lower=0).resample('W').max()
+    mr_neg = market_returns.clip(upper=0).resample('W').min()
+    
+    ax2.fill_between(mr_pos.index.to_numpy(), 0, mr_pos.to_numpy(), 
+                     color='lightgreen', alpha=0.6, label='Market Return (+)', step='mid', rasterized=True)
+    ax2.fill_between(mr_neg.index.to_numpy(), 0, mr_neg.to_numpy(), 
+                     color='lightcoral', alpha=0.6, label='Market Return (-)', step='mid', rasterized=True)
                      
     ax2.set_ylabel('Market Daily Return', fontsize=14)
     ax2.set_ylim(-0.10, 0.10)
     
     # --- Left Axis (Foreground): Annualized Volatility ---
     # BANK: Navy (#1e40af)
-    ax1.plot(volatility.index, volatility['BANK'], color='#1e40af', linewidth=1.5, label='Nifty Bank Volatility')
+    ax1.plot(idx, volatility['BANK'], color='#1e40af', linewidth=1.5, label='Nifty Bank Volatility')
     # IT: Orange (#f97316)
-    ax1.plot(volatility.index, volatility['IT'], color='#f97316', linewidth=1.5, label='Nifty IT Volatility')
+    ax1.plot(idx, volatility['IT'], color='#f97316', linewidth=1.5, label='Nifty IT Volatility')
     
     ax1.set_ylabel('Annualized Volatility (%)', fontsize=14)
     ax1.set_ylim(0, 100)
@@ -128,7 +130,7 @@ def plot_risk_crashes(volatility, market_returns):
     
     # Save
     output_file = 'sector_risk_crashes_300dpi.png'
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    save(output_file)
     print(f"Plot saved to {output_file}")
     plt.close()
 
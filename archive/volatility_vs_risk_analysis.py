@@ -1,28 +1,14 @@
-import yfinance as yf
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from _common import SQRT_252, download_closes, risk_score, rolling_std
+from _plot_style import headless, save
+
+headless()
 
 def fetch_data():
     """Fetches NIFTY 50 data from 2015 to present."""
     print("Fetching NIFTY 50 data from 2015-01-01 to 2025-11-28...")
-    data = yf.download('^NSEI', start='2015-01-01', end='2025-11-28', progress=False)
-    
-    if isinstance(data.columns, pd.MultiIndex):
-        try:
-            close = data['Adj Close']
-        except KeyError:
-            close = data['Close']
-    else:
-        close = data['Adj Close'] if 'Adj Close' in data.columns else data['Close']
-        
-    if isinstance(close, pd.DataFrame):
-        close = close.iloc[:, 0]
-        
-    df = pd.DataFrame({'Close': close})
-    df.dropna(inplace=True)
-    return df
+    close = download_closes(('^NSEI',), start='2015-01-01', end='2025-11-28')['^NSEI']
+    return close.dropna().to_frame('Close')
 
 def calculate_metrics(df):
     """Calculates 30-day Volatility and Risk Score v2."""
@@ -31,31 +17,23 @@ def calculate_metrics(df):
     
     # 1. Volatility (30-day Rolling Standard Deviation of Daily Returns)
     # NOT annualized, to match the 0-0.05 scale request.
-    df['Vol_30d'] = df['Return'].rolling(window=30).std()
+    # Running-sum rolling std: constant work per row instead of per window
+    df['Vol_30d'] = rolling_std(df['Return'].to_numpy(), 30)
     
     # 2. Risk Score v2 (Vol-only fallback)
-    # We need Annualized Volatility for the Risk Score formula to be consistent with other plots
-    annualized_vol = df['Vol_30d'] * (252 ** 0.5)
-    
-    # Filter extreme glitches (> 100%)
-    annualized_vol = annualized_vol.mask(annualized_vol > 1.0)
-    
-    # Z-score of volatility
-    vol_mean = annualized_vol.mean()
-    vol_std_dev = annualized_vol.std()
-    if vol_std_dev == 0: vol_std_dev = 1e-6
-    
-    vol_z = (annualized_vol - vol_mean) / vol_std_dev
-    
-    # Risk Formula: 50 + (vol_z * 12)
-    risk_score = 50 + (vol_z * 12.0)
-    df['Risk_Score'] = risk_score.clip(0, 100)
+    # We need Annualized Volatility for the Risk Score formula to be consistent with other plots;
+    # risk_score masks >100% glitches, z-scores and clips (50 + vol_z * 12) in one pass
+    df['Risk_Score'] = risk_score(df['Vol_30d'].to_numpy() * SQRT_252)
     
     return df.dropna()
 
 def plot_volatility_vs_risk(df):
     """Generates the dual-axis plot comparing Volatility and Risk Score."""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    
     # Visual Specifications
+    idx = df.index.to_numpy()
     plt.figure(figsize=(14, 7), dpi=300)
     
     # Create Dual Axis
@@ -67,13 +45,13 @@ def plot_volatility_vs_risk(df):
     color_risk = '#16a34a' # Green
     
     # --- Left Axis: Volatility ---
-    ax1.plot(df.index, df['Vol_30d'], color=color_vol, linewidth=2, label='Vol 30d')
+    ax1.plot(idx, df['Vol_30d'], color=color_vol, linewidth=2, label='Vol 30d')
     ax1.set_ylabel('Volatility (30d)', fontsize=14, color=color_vol)
     ax1.tick_params(axis='y', labelcolor=color_vol)
     ax1.set_ylim(0, 0.045) # Requested scale 0 to 0.045
     
     # --- Right Axis: Risk Score ---
-    ax2.plot(df.index, df['Risk_Score'], color=color_risk, linewidth=2, label='Risk Score v2')
+    ax2.plot(idx, df['Risk_Score'], color=color_risk, linewidth=2, label='Risk Score v2')
     ax2.set_ylabel('Risk Score v2', fontsize=14, color=color_risk)
     ax2.tick_params(axis='y', labelcolor=color_risk)
     ax2.set_ylim(0, 100)
@@ -124,7 +102,7 @@ def plot_volatility_vs_risk(df):
     
     # Save
     output_file = 'vol_risk_composite_300dpi.png'
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    save(output_file)
     print(f"Plot saved to {output_file}")
     plt.close()
 
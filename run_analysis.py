@@ -1,18 +1,57 @@
 import subprocess
 import sys
 import os
+import glob
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# charts whose only inputs are local files; the rest pull yfinance data at run
+# time (some over a window relative to today), so they always re-run.
+# maps script -> the png it writes
+local_only = {
+    "fii_leadlag_analysis.py": "fii_leadlag_impact_300dpi.png"
+}
+
+# hash of everything a local-only chart depends on: its source, the shared
+# src/_*.py helpers and the processed data files (csv/parquet) it reads.
+# data/cache is left out, the fetching scripts rewrite it while charts run
+def input_hash(script):
+    h = hashlib.sha256()
+    paths = [os.path.join("src", script)]
+    paths += sorted(glob.glob(os.path.join("src", "_*.py")))
+    paths += sorted(glob.glob(os.path.join("data", "*.csv")) + glob.glob(os.path.join("data", "*.parquet")))
+    for p in paths:
+        h.update(p.encode())
+        with open(p, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def run(script, cached=False):
+    # skip local-only charts whose inputs haven't changed since the last good
+    # run, as long as the chart itself is still there
+    stamp = os.path.join("plots", f"{script}.sha256")
+    cached = cached and script in local_only
+    if cached:
+        digest = input_hash(script)
+        out = os.path.join("plots", local_only[script])
+        if os.path.exists(out) and os.path.exists(stamp) and open(stamp).read().strip() == digest:
+            print(f"skip {script} (inputs unchanged)")
+            return True
 
-def run(script):
     print(f"running {script}...")
     try:
-        # run from src dir so relative paths work
-        res = subprocess.run([sys.executable, script], cwd="src", check=True, capture_output=True, text=True)
-        print(res.stdout)
-        print(f"ok {script}")
+        # run from src dir so relative paths work; charts render off-screen
+        env = dict(os.environ, MPLBACKEND="Agg")
+        res = subprocess.run([sys.executable, script], cwd="src", env=env, check=True, capture_output=True, text=True)
+        print(res.stdout + f"ok {script}")
+        if cached:
+            os.makedirs("plots", exist_ok=True)
+            with open(stamp, 'w') as f:
+                f.write(digest + "\n")
+        return True
     except subprocess.CalledProcessError as e:
-        print(f"error {script}:")
-        print(e.stderr)
-        sys.exit(1)
+        print(f"error {script}:\n{e.stderr}")
+        return False
 
 def main():
     print("starting analysis...")
@@ -21,7 +60,8 @@ def main():
     # run("collect_data.py")
 
     # process data
-    run("process_market_data.py")
+    if not run("process_market_data.py"):
+        sys.exit(1)
     
     # charts
     scripts = [
@@ -32,11 +72,25 @@ def main():
         "sector_correlation_matrix.py"
     ]
     
+    # --force re-renders everything regardless of the hash stamps
+    cached = "--force" not in sys.argv[1:]
+    
+    todo = []
     for s in scripts:
         if os.path.exists(os.path.join("src", s)):
-            run(s)
+            todo.append(s)
         else:
             print(f"missing src/{s}")
+    
+    # charts are independent, so run them side by side; every script gets to
+    # finish before a failure is reported
+    with ThreadPoolExecutor(max_workers=max(1, min(len(todo), os.cpu_count() or 1))) as ex:
+        results = list(ex.map(lambda s: run(s, cached), todo))
+    
+    failed = [s for s, ok in zip(todo, results) if not ok]
+    if failed:
+        print(f"\nfailed: {', '.join(failed)}")
+        sys.exit(1)
             
     print("\nall done.")
 
@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+import pandas as pd
+
+# downloaded closes live here, one parquet per ticker + start date
+cache_dir = "../data/cache"
+
+def _path(ticker, start):
+    safe = ticker.replace('^', '').replace('/', '_')
+    return os.path.join(cache_dir, f"{safe}_{start}.parquet")
+
+# a cached file starting on or before start covers it too (trimmed on the way
+# out), so a rolling start keeps reusing the newest such file
+def _find(ticker, start):
+    safe = ticker.replace('^', '').replace('/', '_')
+    pat = re.compile(re.escape(safe) + r'_(\d{4}-\d{2}-\d{2})\.parquet')
+    found = []
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            m = pat.fullmatch(name)
+            if m and m.group(1) <= start:
+                found.append(m.group(1))
+    return _path(ticker, max(found)) if found else _path(ticker, start)
+
+# exclusive end that stops at the last completed session: today's bar is still
+# forming, and a weekend run then finds nothing missing
+def last_session_end():
+    last = pd.Timestamp.today().normalize() - pd.offsets.BDay(1)
+    return (last + pd.Timedelta(days=1)).date().isoformat()
+
+# pull a Close column out of whatever shape yf.download hands back
+def _closes(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        try:
+            close = data['Adj Close']
+        except KeyError:
+            close = data['Close']
+    else:
+        close = data['Adj Close'] if 'Adj Close' in data.columns else data['Close']
+
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+
+    close = close.dropna()
+    close.index = pd.DatetimeIndex(close.index).tz_localize(None)
+    close.index.name = 'Date'
+    return close.to_frame('Close')
+
+def _empty():
+    return pd.DataFrame({'Close': pd.Series(dtype='float64')}, index=pd.DatetimeIndex([], name='Date'))
+
+# scripts run side by side and share tickers, so write to a temp file and
+# swap it in; a reader never sees a half-written parquet
+def _write(df, path):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_parquet(tmp, engine='pyarrow')
+    os.replace(tmp, path)
+
+# closes for each ticker in [start, end); every ticker with a missing tail is
+# refreshed by one batched download starting at the oldest gap. the refetch
+# starts at the last cached bar, not the day after, and overwrites it: a bar
+# cached on the day it traded may have been provisional
+def load_or_fetch_many(tickers, start, end):
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    frames, paths, nxt = {}, {}, {}
+    for t in tickers:
+        path = paths[t] = _find(t, start)
+        df = pd.read_parquet(path, engine='pyarrow') if os.path.exists(path) else _empty()
+        frames[t] = df
+        if not len(df):
+            nxt[t] = start_ts
+            continue
+        last = df.index.max()
+        written = pd.Timestamp(os.path.getmtime(path), unit='s').normalize()
+        if last + pd.Timedelta(days=1) < end_ts or (written <= last < end_ts):
+            nxt[t] = last
+
+    if nxt:
+        import yfinance as yf
+        first = min(nxt.values()).date().isoformat()
+        data = yf.download(list(nxt), start=first, end=end, group_by='ticker', threads=True, progress=False)
+        grouped = isinstance(data.columns, pd.MultiIndex)
+        for t, n in nxt.items():
+            if grouped and t not in data.columns.get_level_values(0):
+                continue
+            new = _closes(data[t] if grouped else data)
+            new = new[new.index >= n]
+            if len(new):
+                old = frames[t][frames[t].index < n]
+                frames[t] = pd.concat([old, new]) if len(old) else new
+                _write(frames[t], paths[t])
+
+    return {t: df[(df.index >= start_ts) & (df.index < end_ts)] for t, df in frames.items()}
+
+# whatever is already cached for a ticker in [start, end), no download
+def load_cached(ticker, start, end):
+    path = _find(ticker, start)
+    df = pd.read_parquet(path, engine='pyarrow') if os.path.exists(path) else _empty()
+    return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+# closes for a single ticker, same caching rules
+def load_or_fetch(ticker, start, end):
+    return load_or_fetch_many([ticker], start, end)[ticker]
+
+# {name: ticker} -> one frame of closes, columns renamed to the names and laid
+# out in ticker order like a multi-ticker yf.download
+def load_closes(ticks, start, end):
+    frames = load_or_fetch_many(list(ticks.values()), start, end)
+    inv = {v: k for k, v in ticks.items()}
+    return pd.concat({inv[t]: frames[t]['Close'] for t in sorted(frames)}, axis=1)
@@ -0,0 +1,16 @@
+import matplotlib
+
+# headless agg render; long date lines go through agg in bigger chunks and get simplified.
+# only matplotlib itself is loaded here, so a script that imports pyplot inside
+# its draw function never pays for it when the data load fails
+def headless():
+    matplotlib.use('Agg')
+    matplotlib.rcParams['agg.path.chunksize'] = 10000
+    matplotlib.rcParams['path.simplify'] = True
+    matplotlib.rcParams['path.simplify_threshold'] = 1.0
+
+# lay out once and save at the figure size, no second tight-bbox render pass
+def save(out, dpi=300):
+    import matplotlib.pyplot as plt
+    plt.tight_layout()
+    plt.savefig(out, dpi=dpi, bbox_inches=None, pil_kwargs={'compress_level': 1})
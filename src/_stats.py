@@ -0,0 +1,86 @@
+import numpy as np
+
+# trailing sums over `window` rows, nan before the first full window
+def window_sums(a, window):
+    c = np.cumsum(a, axis=0)
+    out = np.full(c.shape, np.nan)
+    out[window - 1] = c[window - 1]
+    out[window:] = c[window:] - c[:-window]
+    return out
+
+# rolling sample std (ddof=1) from running sums, O(1) per row whatever the window.
+# values are demeaned first so the sum-of-squares difference doesn't cancel out;
+# windows with a missing value are nan, same as pandas rolling(window).std()
+def rolling_std(x, window):
+    x = np.asarray(x, dtype=np.float64)
+    ok = ~np.isnan(x)
+    d = np.where(ok, x - np.nanmean(x), 0.0)
+    n = window_sums(ok.astype(np.float64), window)
+    s = window_sums(d, window)
+    s2 = window_sums(d * d, window)
+
+    var = (s2 - s * s / window) / (window - 1)
+    # differences this far below the sums are rounding noise (a flat window)
+    var[var < 1e-10 * s2 / (window - 1)] = 0.0
+    var[~(n == window)] = np.nan
+    return np.sqrt(np.maximum(var, 0.0))
+
+# rolling pearson of every column of X against y over `window` rows, all columns
+# from one set of running sums. pairs are demeaned first like rolling_std; windows
+# with a missing pair or a flat series are nan, same as pandas rolling(window).corr()
+def rolling_corr(X, y, window):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)[:, None]
+    ok = ~(np.isnan(X) | np.isnan(y))
+    x = np.where(ok, X - np.nanmean(X, axis=0), 0.0)
+    y = np.where(ok, y - np.nanmean(y), 0.0)
+    
+    n = window_sums(ok.astype(np.float64), window)
+    sx, sy = window_sums(x, window), window_sums(y, window)
+    sxx, syy = window_sums(x * x, window), window_sums(y * y, window)
+    sxy = window_sums(x * y, window)
+    
+    vx = sxx - sx * sx / window
+    vy = syy - sy * sy / window
+    # same flat-window cutoff as rolling_std
+    vx[vx < 1e-10 * sxx] = 0.0
+    vy[vy < 1e-10 * syy] = 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (sxy - sx * sy / window) / np.sqrt(vx * vy)
+    r[~(n == window) | (vx == 0) | (vy == 0)] = np.nan
+    return r
+
+# rolling beta of every column of X on y, cov(x, y) / var(y) over `window` rows,
+# all columns from the same running sums as rolling_corr. windows with a missing
+# pair are nan, same as pandas rolling(window).cov(y) / y.rolling(window).var()
+def rolling_beta(X, y, window):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)[:, None]
+    ok = ~(np.isnan(X) | np.isnan(y))
+    x = np.where(ok, X - np.nanmean(X, axis=0), 0.0)
+    y = np.where(ok, y - np.nanmean(y), 0.0)
+    
+    n = window_sums(ok.astype(np.float64), window)
+    sx, sy = window_sums(x, window), window_sums(y, window)
+    syy, sxy = window_sums(y * y, window), window_sums(x * y, window)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = (sxy - sx * sy / window) / (syy - sy * sy / window)
+    b[~(n == window)] = np.nan
+    return b
+
+# volatility-only risk score v2 from daily returns in one go: annualised rolling
+# std, readings over 100% dropped as glitches, then 50 + 12*z clipped to [0, 100]
+def risk_score(ret, window=30, annual=252):
+    vol = rolling_std(ret, window) * np.sqrt(annual)
+    vol[vol > 1.0] = np.nan
+    
+    # compact the valid readings once and take mean/std off that buffer,
+    # rather than nanmean + nanstd each re-masking the whole array
+    v = vol[~np.isnan(vol)]
+    v_mean = v.mean()
+    v_std = v.std(ddof=1)
+    if v_std == 0: v_std = 1e-6
+
+    z = (vol - v_mean) / v_std
+    return np.clip(50 + 12.0 * z, 0, 100, out=z)
@@ -1,8 +1,11 @@
-import yfinance as yf
+import orjson
 import pandas as pd
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
+from _cache import load_cached, load_or_fetch, load_or_fetch_many
 
 # settings
 start_dt = "2015-01-01"
@@ -24,108 +27,122 @@ ticks = {
 
 def get_sectors():
     print("getting sectors...")
+    # one batched download for every ticker whose cache is behind
+    failed = []
+    try:
+        frames = load_or_fetch_many(list(ticks.values()), start_dt, end_dt)
+    except Exception as e:
+        # don't lose every sector to one bad batch: retry ticker by ticker and
+        # fall back to whatever is cached for the ones that still fail
+        print(f"batched download failed ({e}), retrying per ticker...")
+        frames = {}
+        for name, t in ticks.items():
+            try:
+                frames[t] = load_or_fetch(t, start_dt, end_dt)
+            except Exception as e:
+                print(f"download failed for {name}: {e}")
+                failed.append(name)
+                frames[t] = load_cached(t, start_dt, end_dt)
+
     for name, t in ticks.items():
-        print(f"downloading {name}...")
-        try:
-            df = yf.download(t, start=start_dt, end=end_dt, progress=False)
-            if df.empty:
-                print(f"no data for {name}")
-                continue
-                
-            # flatten if multiindex
-            if isinstance(df.columns, pd.MultiIndex):
-                try:
-                    df = df['Adj Close']
-                except:
-                    df = df['Close']
-            else:
-                c = 'Adj Close' if 'Adj Close' in df.columns else 'Close'
-                df = df[[c]].rename(columns={c: 'Close'})
-            
-            # ensure it's a dataframe with Close column
-            if isinstance(df, pd.Series):
-                df = df.to_frame(name='Close')
-            elif 'Close' not in df.columns and 'Adj Close' in df.columns:
-                 df = df.rename(columns={'Adj Close': 'Close'})
-            elif 'Close' not in df.columns:
-                 # fallback if still no close
-                 df.columns = ['Close']
+        df = frames[t]
+        if df.empty:
+            print(f"no data for {name}")
+            continue
+        
+        # parquet keeps the datetime index typed, no csv re-parse downstream
+        df.reset_index().to_parquet(f"../data/{name}.parquet", engine='pyarrow', compression='snappy', index=False)
+        print(f"saved {name}.parquet" + (" (cached data only)" if name in failed else ""))
+    
+    if failed:
+        print(f"failed to refresh: {', '.join(failed)}")
+
+# nse wants browser-ish headers and the homepage cookies
+nse_headers = {
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'accept-language': 'en-US,en;q=0.9',
+    'referer': 'https://www.nseindia.com/reports/fii-dii'
+}
+
+# one session per worker thread, warmed up with the homepage cookies
+_local = threading.local()
+
+def _session():
+    s = getattr(_local, 's', None)
+    if s is None:
+        s = requests.Session()
+        s.get("https://www.nseindia.com", headers=nse_headers, timeout=10)
+        _local.s = s
+    return s
+
+# global limit of `rate` requests/sec shared by all workers
+_rate_lock = threading.Lock()
+_next_slot = [0.0]
+
+def _wait_turn(rate=4):
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _next_slot[0])
+        _next_slot[0] = slot + 1.0 / rate
+    time.sleep(slot - now)
+
+# nse sends amounts like "12,345.67"; translate drops the commas in one call
+_no_commas = str.maketrans('', '', ',')
+
+def _num(s):
+    return float(s.translate(_no_commas))
+
+# d_str is the url date (dd-mm-yyyy), day the row label (dd-Mon-yyyy)
+def fetch_one(d_str, day):
+    url = f"https://www.nseindia.com/api/fiidiiArchives?category=capital-market&date={d_str}"
+    
+    try:
+        s = _session()
+        _wait_turn()
+        r = s.get(url, headers=nse_headers, timeout=5)
+        if r.status_code == 200:
+            data = orjson.loads(r.content)
+            fii = next((x for x in data if "FII" in x['category'] or "FPI" in x['category']), None)
+            dii = next((x for x in data if "DII" in x['category']), None)
             
-            df.reset_index(inplace=True)
-            df.to_csv(f"../data/{name}.csv", index=False)
-            print(f"saved {name}.csv")
-        except Exception as e:
-            print(f"error {name}: {e}")
+            if fii and dii:
+                print(f"got {d_str}", end='\r')
+                return {
+                    'Date': day,
+                    'FII Buy': _num(fii['buyValue']),
+                    'FII Sell': _num(fii['sellValue']),
+                    'DII Buy': _num(dii['buyValue']),
+                    'DII Sell': _num(dii['sellValue'])
+                }
+        else:
+            # refresh
+            s.get("https://www.nseindia.com", headers=nse_headers)
+    except:
+        pass
+    return None
 
 def get_flows():
     print("getting fii/dii data...")
     # nse scraping is tricky, using requests
-    s = requests.Session()
-    h = {
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'accept-language': 'en-US,en;q=0.9',
-        'referer': 'https://www.nseindia.com/reports/fii-dii'
-    }
-    
-    # init cookies
+    # check the site is reachable before spinning up workers
     try:
-        s.get("https://www.nseindia.com", headers=h, timeout=10)
+        _session()
     except:
         print("nse connection failed.")
         return
 
-    # fetch last 365 days for now to avoid long wait
-    # logic from notebook was complex, simplifying for production
-    # actually, let's just try to get recent data or use a known source if possible
-    # the notebook logic iterated day by day. that's slow but works.
-    # let's do last 30 days for demo, or full range if user wants.
-    # user said "add data collection part", implying the full logic.
-    
-    # let's use a simpler approach: just check if file exists, if not, warn user.
-    # scraping 10 years day-by-day is too long for a script run.
-    # i'll implement the day-by-day logic but limit it to recent data or specific range.
-    # or better, just put the logic there but maybe comment out the long run.
-    
-    # actually, let's just implement the logic to fetch *missing* data if possible,
-    # or just a fresh fetch for recent times.
-    
-    # for this repo, i'll stick to the notebook logic but maybe limit to 1 year?
-    # notebook had start_date = "01-09-2022". let's use that.
-    
+    # scraping 10 years day-by-day is too long for a script run,
+    # notebook had start_date = "01-09-2022". recent range is enough here.
     start = "01-01-2023" # reasonable start for demo
     dates = pd.bdate_range(start=start, end=datetime.now())
+    # format both date strings for the whole range up front
+    url_dates = dates.strftime('%d-%m-%Y').to_numpy()
+    row_dates = dates.strftime('%d-%b-%Y').to_numpy()
     
     print(f"fetching flows from {start}...")
-    rows = []
-    
-    for d in dates:
-        d_str = d.strftime("%d-%m-%Y")
-        url = f"https://www.nseindia.com/api/fiidiiArchives?category=capital-market&date={d_str}"
-        
-        try:
-            r = s.get(url, headers=h, timeout=5)
-            if r.status_code == 200:
-                data = r.json()
-                fii = next((x for x in data if "FII" in x['category'] or "FPI" in x['category']), None)
-                dii = next((x for x in data if "DII" in x['category']), None)
-                
-                if fii and dii:
-                    row = {
-                        'Date': d.strftime('%d-%b-%Y'),
-                        'FII Buy': float(fii['buyValue'].replace(',', '')),
-                        'FII Sell': float(fii['sellValue'].replace(',', '')),
-                        'DII Buy': float(dii['buyValue'].replace(',', '')),
-                        'DII Sell': float(dii['sellValue'].replace(',', ''))
-                    }
-                    rows.append(row)
-                    print(f"got {d_str}", end='\r')
-            else:
-                # refresh
-                s.get("https://www.nseindia.com", headers=h)
-        except:
-            pass
-        
-        time.sleep(0.5)
+    # 8 requests in flight, paced to 4/sec overall instead of sleeping per day
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        rows = [r for r in ex.map(fetch_one, url_dates, row_dates) if r]
         
     if rows:
         df = pd.DataFrame(rows)
@@ -1,12 +1,28 @@
+import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from _plot import headless, save
+
+headless()
+
+# the only columns load_stuff needs out of the ~50 in the master table
+want = ['Date', 'FII_Net',
+        'NIFTY_BANK_Close', 'NIFTY_PSU_BANK_Close', 'NIFTY_IT_Close',
+        'NIFTY_BANK_Return', 'NIFTY_PSU_BANK_Return', 'NIFTY_IT_Return']
 
 def load_stuff(path):
-    print(f"loading {path}...")
-    df = pd.read_csv(path)
-    df['Date'] = pd.to_datetime(df['Date'])
+    # typed parquet copy from process_market_data if it's at least as new as the csv
+    pq = os.path.splitext(path)[0] + '.parquet'
+    if os.path.exists(pq) and (not os.path.exists(path) or os.path.getmtime(pq) >= os.path.getmtime(path)):
+        print(f"loading {pq}...")
+        import pyarrow.parquet as papq
+        names = papq.read_schema(pq).names
+        df = pd.read_parquet(pq, engine='pyarrow', columns=[c for c in want if c in names])
+    else:
+        print(f"loading {path}...")
+        # pyarrow won't take a callable usecols, so match against the header
+        names = pd.read_csv(path, nrows=0).columns
+        df = pd.read_csv(path, engine='pyarrow', usecols=[c for c in want if c in names], parse_dates=['Date'])
     df = df.sort_values('Date')
     
     # check cols
@@ -23,28 +39,54 @@ def load_stuff(path):
     
     return df
 
+# sectors to check, in the column order of get_lead_lag's result
+secs = {
+    'BANK': 'NIFTY_BANK_Return',
+    'PSU_BANK': 'NIFTY_PSU_BANK_Return',
+    'IT': 'NIFTY_IT_Return'
+}
+
+# returns the lags and a (n_lags, n_secs) correlation array
 def get_lead_lag(df, lags=range(-10, 11)):
-    # sectors to check
-    secs = {
-        'BANK': 'NIFTY_BANK_Return',
-        'PSU_BANK': 'NIFTY_PSU_BANK_Return',
-        'IT': 'NIFTY_IT_Return'
-    }
-    
-    res = {s: [] for s in secs}
     lag_list = list(lags)
     
-    for l in lag_list:
-        # shift fii
-        fii_s = df['FII_Net'].shift(l)
-        
-        for s, r in secs.items():
-            c = fii_s.corr(df[r])
-            res[s].append(c)
-            
-    return lag_list, res
+    fii = df['FII_Net'].to_numpy(dtype=np.float64)
+    R = df[list(secs.values())].to_numpy(dtype=np.float64)
+    
+    # cut the all-nan head/tail once, those rows can't pair at any lag
+    has = ~np.isnan(fii) | ~np.isnan(R).all(axis=1)
+    lo, hi = has.argmax(), len(has) - has[::-1].argmax()
+    fii, R = fii[lo:hi], R[lo:hi]
+    
+    # standardise once, the shifts only move values around
+    fii = (fii - np.nanmean(fii)) / np.nanstd(fii)
+    R = (R - np.nanmean(R, axis=0)) / np.nanstd(R, axis=0)
+    
+    # (N, lags) matrix of shifted fii, nan where the shift runs off the end
+    N = len(fii)
+    F = np.full((N, len(lag_list)), np.nan)
+    for j, l in enumerate(lag_list):
+        if l >= 0:
+            F[l:, j] = fii[:N - l]
+        else:
+            F[:l, j] = fii[-l:]
+    
+    # pairwise-complete pearson for every (lag, sector) from masked moment sums,
+    # same result as fii.shift(l).corr(ret) but a handful of matmuls
+    mF, mR = ~np.isnan(F), ~np.isnan(R)
+    F0, R0 = np.where(mF, F, 0.0), np.where(mR, R, 0.0)
+    mF, mR = mF.astype(np.float64), mR.astype(np.float64)
+    n = mF.T @ mR
+    sf, sr = F0.T @ mR, mF.T @ R0
+    sff, srr = (F0 * F0).T @ mR, mF.T @ (R0 * R0)
+    sfr = F0.T @ R0
+    c = (n * sfr - sf * sr) / np.sqrt((n * sff - sf * sf) * (n * srr - sr * sr))
+    
+    return lag_list, c
 
 def draw_plot(lags, corrs):
+    import matplotlib.pyplot as plt
+    
     plt.figure(figsize=(12, 7), dpi=300)
     
     # styles
@@ -54,15 +96,15 @@ def draw_plot(lags, corrs):
         'IT': {'c': '#0d9488', 'ls': ':', 'lw': 2.5, 'lbl': 'IT', 'm': '^'}
     }
     
-    for s, vals in corrs.items():
+    # peak of every sector in one reduction
+    peaks = np.argmax(corrs, axis=0)
+    peak_lags = np.asarray(lags)[peaks]
+    peak_vals = corrs[peaks, np.arange(corrs.shape[1])]
+    
+    for j, s in enumerate(secs):
         sty = st[s]
-        # find peak
-        pidx = np.argmax(vals)
-        plag = lags[pidx]
-        pval = vals[pidx]
-        
-        plt.plot(lags, vals, color=sty['c'], linestyle=sty['ls'], linewidth=sty['lw'], label=sty['lbl'])
-        plt.plot(plag, pval, marker=sty['m'], markersize=8, color=sty['c'])
+        plt.plot(lags, corrs[:, j], color=sty['c'], linestyle=sty['ls'], linewidth=sty['lw'], label=sty['lbl'])
+        plt.plot(peak_lags[j], peak_vals[j], marker=sty['m'], markersize=8, color=sty['c'])
 
     plt.grid(True, alpha=0.3)
     plt.axvline(x=0, color='gray', linestyle='--', alpha=0.5)
@@ -76,7 +118,7 @@ def draw_plot(lags, corrs):
     plt.legend()
     
     # annotations
-    b_vals = corrs['BANK']
+    b_vals = corrs[:, list(secs).index('BANK')]
     z_idx = lags.index(0)
     b_0 = b_vals[z_idx]
     
@@ -87,7 +129,7 @@ def draw_plot(lags, corrs):
              bbox=dict(facecolor='white', alpha=0.8))
 
     out = '../plots/fii_leadlag_impact_300dpi.png'
-    plt.savefig(out, dpi=300, bbox_inches='tight')
+    save(out)
     print(f"saved {out}")
     plt.close()
 
@@ -1,30 +1,16 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.lines import Line2D
-from matplotlib.patches import Patch
+from _cache import load_or_fetch
+from _stats import risk_score
+from _plot import headless, save
+
+headless()
 
 def get_nifty_data():
     print("getting nifty data...")
     try:
-        data = yf.download('^NSEI', start='2015-01-01', end='2022-12-31', progress=False)
-        
-        if isinstance(data.columns, pd.MultiIndex):
-            try:
-                close = data['Adj Close']
-            except:
-                close = data['Close']
-        else:
-            close = data['Adj Close'] if 'Adj Close' in data.columns else data['Close']
-            
-        if isinstance(close, pd.DataFrame):
-            close = close.iloc[:, 0]
-            
-        df = pd.DataFrame({'Close': close})
-        df.dropna(inplace=True)
-        return df
+        close = load_or_fetch('^NSEI', '2015-01-01', '2022-12-31')['Close']
+        return close.dropna().to_frame('Close')
     except:
         return pd.DataFrame()
 
@@ -32,48 +18,46 @@ def find_regimes(df):
     # returns
     df['Return'] = df['Close'].pct_change()
     
-    # vol
-    roll = df['Return'].rolling(30).std()
-    ann_vol = roll * (252 ** 0.5)
-    ann_vol = ann_vol.mask(ann_vol > 1.0)
-    
-    # risk score
-    v_mean = ann_vol.mean()
-    v_std = ann_vol.std()
-    if v_std == 0: v_std = 1e-6
-    
-    z = (ann_vol - v_mean) / v_std
-    
-    score = 50 + (z * 12.0)
-    df['Risk_Score'] = score.clip(0, 100)
+    # vol -> risk score, one fused numpy pass
+    df['Risk_Score'] = risk_score(df['Return'].to_numpy(), 30)
     
     return df.dropna()
 
 def draw_plot(df):
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+    
+    # one plain datetime64 array for every artist below
+    idx = df.index.to_numpy()
+    
     plt.figure(figsize=(14, 7), dpi=300)
     
     ax1 = plt.gca()
     ax2 = ax1.twinx()
     
     # nifty
-    ax1.plot(df.index, df['Close'], color='black', linewidth=2, label='NIFTY 50')
+    ax1.plot(idx, df['Close'], color='black', linewidth=2, label='NIFTY 50')
     ax1.set_ylabel('NIFTY 50 Level', fontsize=14)
     ax1.set_ylim(6000, 20000)
     
     # risk
-    ax2.plot(df.index, df['Risk_Score'], color='none', alpha=0) 
+    ax2.plot(idx, df['Risk_Score'], color='none', alpha=0) 
     ax2.set_ylabel('Risk Score v2', fontsize=14)
     ax2.set_ylim(0, 100)
     
-    # bands
-    ax2.fill_between(df.index, 0, 100, where=(df['Risk_Score'] < 40), 
-                     color='#4ade80', alpha=0.4, label='Low Risk')
-    
-    ax2.fill_between(df.index, 0, 100, where=((df['Risk_Score'] >= 40) & (df['Risk_Score'] <= 60)), 
-                     color='#facc15', alpha=0.4, label='Medium Risk')
-                     
-    ax2.fill_between(df.index, 0, 100, where=(df['Risk_Score'] > 60), 
-                     color='#f87171', alpha=0.4, label='High Risk')
+    # bands, one axvspan per contiguous run instead of a full-length where= mask
+    rs = df['Risk_Score'].to_numpy()
+    bands = [
+        (rs < 40, '#4ade80'),
+        ((rs >= 40) & (rs <= 60), '#facc15'),
+        (rs > 60, '#f87171')
+    ]
+    for band, c in bands:
+        edges = np.flatnonzero(np.diff(np.r_[0, band.view(np.int8), 0]))
+        for s, e in zip(edges[::2], edges[1::2]):
+            ax2.axvspan(idx[s], idx[e - 1], color=c, alpha=0.4, linewidth=0)
     
     # events
     evs = [
@@ -85,7 +69,7 @@ def draw_plot(df):
     
     for d, l, c in evs:
         do = pd.to_datetime(d)
-        if do >= df.index.min() and do <= df.index.max():
+        if idx[0] <= do <= idx[-1]:
             ax1.axvline(x=do, color=c, linestyle='--', alpha=0.8)
             ax1.text(do, ax1.get_ylim()[1]*0.95, f' {l}', 
                      color=c, rotation=90, va='top', fontsize=10, fontweight='bold')
@@ -108,7 +92,7 @@ def draw_plot(df):
     ax1.legend(handles=legs, loc='upper left', frameon=True, shadow=True)
     
     out = '../plots/market_risk_regimes_300dpi.png'
-    plt.savefig(out, dpi=300, bbox_inches='tight')
+    save(out)
     print(f"saved {out}")
     plt.close()
 
@@ -1,9 +1,15 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from _stats import rolling_corr, rolling_std
 
 # settings
 data_dir = "../data" 
@@ -13,15 +19,14 @@ fii_file = "FiiDiiTradingactivity.csv"
 clean_fii = "FII_DII_cleaned.csv"
 master_file = "master_market_data_2015_2022.csv"
 final_file = "master_market_data_2015_2022_final.csv"
-
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_context("talk")
+final_pq = "master_market_data_2015_2022_final.parquet"
 
 # 1. clean up the flow data
 def fix_flow_data(path):
     print(f"cleaning {path}...")
+    # arrow parses the file and keeps the text columns as arrow strings
     try:
-        df = pd.read_csv(path)
+        df = pd.read_csv(path, engine='pyarrow', dtype_backend='pyarrow')
     except:
         print("file not found.")
         return None
@@ -34,18 +39,21 @@ def fix_flow_data(path):
 
     df = df.dropna(subset=['Date'])
 
-    # helper to fix numbers
-    def fix_num(x):
-        if isinstance(x, str):
-            x = x.replace(',', '').replace('(', '-').replace(')', '').replace(' ', '')
-        return pd.to_numeric(x, errors='coerce')
-
     # fix columns
     df.columns = [c.strip() for c in df.columns]
     
-    for c in df.columns:
-        if c != 'Date':
-            df[c] = df[c].apply(fix_num)
+    # fix numbers: "(1,234.5)" -> -1234.5. all text columns are stacked into one
+    # arrow string series so the replaces (arrow compute kernels) and to_numeric
+    # run once, then folded back
+    txt = [c for c in df.columns if c != 'Date' and not pd.api.types.is_numeric_dtype(df[c])]
+    if txt:
+        flat = pd.concat([df[c].astype('string[pyarrow]') for c in txt], ignore_index=True)
+        flat = flat.str.replace(r'[, )]', '', regex=True).str.replace('(', '-', regex=False)
+        nums = pd.to_numeric(flat, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        df[txt] = nums.reshape(len(txt), len(df)).T
+    
+    # back to plain float64 so the master table stays numpy-backed
+    df = df.astype(dict.fromkeys([c for c in df.columns if c != 'Date'], np.float64))
 
     # try to find cols
     fii_buy = next((c for c in df.columns if 'FII' in c and 'Buy' in c), None)
@@ -80,60 +88,90 @@ def fix_flow_data(path):
     return out
 
 # 2. read sector files
+# one sector file -> (dates, closes) arrays, or None if it can't be used
+def _read_sector(name, f):
+    print(f"reading {name}...")
+    try:
+        tbl = pq.read_table(f) if f.endswith('.parquet') else pacsv.read_csv(f)
+        df = tbl.to_pandas()
+        # fix date
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        else:
+            d_col = next((c for c in df.columns if 'Date' in c or 'date' in c), None)
+            if d_col:
+                df = df.rename(columns={d_col: 'Date'})
+                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        
+        df = df.dropna(subset=['Date'])
+        df = df.sort_values('Date', kind='stable')
+        
+        # get close price
+        c_col = next((c for c in df.columns if 'Close' in c), None)
+        if c_col:
+            # keep plain arrays, no per-sector frame
+            d = df['Date'].to_numpy(dtype='datetime64[ns]')
+            v = pd.to_numeric(df[c_col], errors='coerce').to_numpy(dtype=np.float64)
+            return d, v
+        print(f"no close col in {name}")
+            
+    except Exception as e:
+        print(f"error {name}: {e}")
+    return None
+
+# returns (dates, names, closes): the nifty 50 calendar, the sector names and a
+# (T, S) float matrix with one column per sector, nan where a sector has no
+# print that day. nifty 50 comes first, the rest in file order
 def read_sector_files():
-    files = glob.glob(os.path.join(data_dir, "NIFTY_*.csv"))
-    data = {}
+    # collector writes parquet now, older csv pulls are still picked up
+    files = {}
+    for f in sorted(glob.glob(os.path.join(data_dir, "NIFTY_*.csv")) + glob.glob(os.path.join(data_dir, "NIFTY_*.parquet"))):
+        name, ext = os.path.splitext(os.path.basename(f))
+        if ext == '.parquet' or name not in files:
+            files[name] = f
     
     print(f"found {len(files)} files.")
     
-    for f in files:
-        name = os.path.basename(f).replace('.csv', '')
-        print(f"reading {name}...")
-        try:
-            df = pd.read_csv(f)
-            # fix date
-            if 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            else:
-                d_col = next((c for c in df.columns if 'Date' in c or 'date' in c), None)
-                if d_col:
-                    df = df.rename(columns={d_col: 'Date'})
-                    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            
-            df = df.dropna(subset=['Date'])
-            df = df.sort_values('Date')
-            
-            # get close price
-            c_col = next((c for c in df.columns if 'Close' in c), None)
-            if c_col:
-                df = df[['Date', c_col]].rename(columns={c_col: f'{name}_Close'})
-                df[f'{name}_Close'] = pd.to_numeric(df[f'{name}_Close'], errors='coerce')
-                data[name] = df
-            else:
-                print(f"no close col in {name}")
-                
-        except Exception as e:
-            print(f"error {name}: {e}")
+    # files are independent and arrow parses with the gil released, so read them side by side
+    with ThreadPoolExecutor(max_workers=min(8, len(files) or 1)) as ex:
+        got = ex.map(_read_sector, files.keys(), files.values())
+        data = {name: r for name, r in zip(files, got) if r is not None}
+    
+    if 'NIFTY_50' not in data:
+        return None, [], None
+    
+    # every sector onto the nifty 50 calendar; searchsorted finds the first
+    # print of each day, so duplicate dates keep the first row. np.unique
+    # also sorts, so the wide master table never needs sorting later
+    dates = np.unique(data['NIFTY_50'][0])
+    names = ['NIFTY_50'] + [n for n in data if n != 'NIFTY_50']
+    closes = np.full((len(dates), len(names)), np.nan)
+    for j, n in enumerate(names):
+        d, v = data[n]
+        if not len(d): continue
+        pos = np.minimum(np.searchsorted(d, dates), len(d) - 1)
+        hit = d[pos] == dates
+        closes[hit, j] = v[pos[hit]]
             
-    return data
+    return dates, names, closes
 
 # 3. make master df
 def make_master_df():
     fii_data = fix_flow_data(os.path.join(data_dir, fii_file))
-    sec_data = read_sector_files()
+    dates, names, closes = read_sector_files()
     
-    if 'NIFTY_50' not in sec_data:
+    if dates is None:
         print("missing nifty 50.")
         return None
 
-    master = sec_data['NIFTY_50'].copy()
-    
-    for name, d in sec_data.items():
-        if name == 'NIFTY_50': continue
-        master = pd.merge(master, d, on='Date', how='left')
+    # the aligned close matrix only becomes a frame here
+    master = pd.DataFrame(closes, index=pd.DatetimeIndex(dates, name='Date'),
+                          columns=[f'{n}_Close' for n in names])
         
     if fii_data is not None:
-        master = pd.merge(master, fii_data, on='Date', how='left')
+        master = master.join(fii_data.set_index('Date'), how='left')
+    
+    master = master.reset_index()
         
     master.to_csv(os.path.join(out_dir, master_file), index=False)
     print(f"saved {master_file}")
@@ -143,71 +181,80 @@ def make_master_df():
 # 4. add calcs
 def add_calcs(df):
     print("adding features...")
-    df = df.copy()
-    df = df.sort_values('Date')
+    # make_master_df builds on the sorted nifty 50 calendar, no wide re-sort here
+    if not df['Date'].is_monotonic_increasing:
+        raise ValueError("master table must be sorted by date")
     
-    # returns
+    # returns + 30d returns for every close in two block calls, one concat
     cols = [c for c in df.columns if 'Close' in c]
-    for c in cols:
-        ret = c.replace('Close', 'Return')
-        df[ret] = df[c].pct_change()
-        
-        # 30d
-        ret30 = c.replace('Close', '30dRet')
-        df[ret30] = df[c].pct_change(periods=30)
+    closes = df[cols]
+    rets = closes.pct_change().rename(columns=lambda c: c.replace('Close', 'Return'))
+    rets30 = closes.pct_change(periods=30).rename(columns=lambda c: c.replace('Close', '30dRet'))
+    
+    # keep the per-sector Return, 30dRet column pairs
+    order = [n for pair in zip(rets.columns, rets30.columns) for n in pair]
+    df = pd.concat([df, pd.concat([rets, rets30], axis=1)[order]], axis=1)
 
-    # volatility
+    # volatility, running-sum rolling std straight on the numpy returns
     if 'NIFTY_50_Return' in df.columns:
-        df['Vol_7d'] = df['NIFTY_50_Return'].rolling(7).std()
-        df['Vol_30d'] = df['NIFTY_50_Return'].rolling(30).std()
-        df['Vol_90d'] = df['NIFTY_50_Return'].rolling(90).std()
+        r = df['NIFTY_50_Return'].to_numpy()
+        df['Vol_7d'] = rolling_std(r, 7)
+        df['Vol_30d'] = rolling_std(r, 30)
+        df['Vol_90d'] = rolling_std(r, 90)
+    
+    # prices/returns/vols don't need float64: halve the frame for everything
+    # downstream. the _stats kernels still accumulate in float64
+    f32 = [c for c in df.columns if c.endswith(('_Close', '_Return', '_30dRet')) or c.startswith('Vol_')]
+    df = df.astype(dict.fromkeys(f32, np.float32))
         
     return df
 
 # 5. calc risk score
 def calc_risk_v2(df):
     print("calculating risk...")
-    df = df.copy()
+    # adds columns to the frame it's given; main reassigns the result anyway
     
     w_vol = 12.0
     w_fii = 6.0
     
-    # z-score vol
-    if 'Vol_30d' in df.columns:
-        v = df['Vol_30d'].dropna()
-        df['vol_z'] = (df['Vol_30d'] - v.mean()) / (v.std() if v.std() != 0 else 1e-6)
-    else:
-        df['vol_z'] = 0
-        
-    # z-score fii
-    if 'FII_Net' in df.columns:
-        f = df['FII_Net'].dropna()
-        df['fii_z'] = (df['FII_Net'] - f.mean()) / (f.std() if f.std() != 0 else 1e-6)
-    else:
-        df['fii_z'] = 0
+    # nan-skipping z-score (ddof=1 like Series.std) straight on the numpy column,
+    # mean/std in float64 off one compacted buffer
+    def zscore(col):
+        a = df[col].to_numpy(dtype=np.float64)
+        v = a[~np.isnan(a)]
+        sd = v.std(ddof=1)
+        return (a - v.mean()) / (sd if sd != 0 else 1e-6)
+    
+    df['vol_z'] = zscore('Vol_30d') if 'Vol_30d' in df.columns else 0
+    df['fii_z'] = zscore('FII_Net') if 'FII_Net' in df.columns else 0
         
-    # formula
-    df['Risk_Score_v2'] = 50 + (df['vol_z'] * w_vol) - (df['fii_z'] * w_fii)
-    df['Risk_Score_v2'] = df['Risk_Score_v2'].clip(0, 100)
+    # formula, one fused expression + clip
+    score = 50 + w_vol * df['vol_z'].to_numpy() - w_fii * df['fii_z'].to_numpy()
+    df['Risk_Score_v2'] = np.clip(score, 0, 100)
     
     return df
 
 # 6. make charts
 def make_charts(df):
     print("making plots...")
+    # styles only matter here, not when the module is imported for its data steps
+    plt.style.use('seaborn-v0_8-darkgrid')
+    sns.set_context("talk")
+    
+    # one figure for the line/bar charts, cleared between them
+    fig = plt.figure(figsize=(12, 6))
     
     # nifty close
-    plt.figure(figsize=(12, 6))
-    plt.plot(df['Date'], df['NIFTY_50_Close'], label='NIFTY 50')
-    plt.title('NIFTY 50 Close Price')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(plot_dir, 'plot_nifty_close.png'), dpi=300)
-    plt.close()
+    ax = fig.add_subplot()
+    ax.plot(df['Date'], df['NIFTY_50_Close'], label='NIFTY 50')
+    ax.set_title('NIFTY 50 Close Price')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(plot_dir, 'plot_nifty_close.png'), dpi=300)
     
     # vol vs risk
-    plt.figure(figsize=(12, 6))
-    ax1 = plt.gca()
+    fig.clf()
+    ax1 = fig.add_subplot()
     ax2 = ax1.twinx()
     
     ax1.plot(df['Date'], df['Vol_30d'], color='blue', alpha=0.6, label='Vol 30d')
@@ -215,33 +262,34 @@ def make_charts(df):
     
     ax1.set_ylabel('Volatility (30d)', color='blue')
     ax2.set_ylabel('Risk Score', color='red')
-    plt.title('Volatility vs Risk Score')
-    plt.tight_layout()
-    plt.savefig(os.path.join(plot_dir, 'plot_vol_risk.png'), dpi=300)
-    plt.close()
+    ax2.set_title('Volatility vs Risk Score')
+    fig.tight_layout()
+    fig.savefig(os.path.join(plot_dir, 'plot_vol_risk.png'), dpi=300)
     
     # sector 30d
     last = df.dropna(subset=['NIFTY_50_Close']).iloc[-1]
     s_cols = [c for c in df.columns if '30dRet' in c]
     if s_cols:
         l_rets = last[s_cols].sort_values()
-        plt.figure(figsize=(12, 8))
-        sns.barplot(x=l_rets.values, y=l_rets.index)
-        plt.title(f'Sector 30d Returns ({last["Date"].date()})')
-        plt.tight_layout()
-        plt.savefig(os.path.join(plot_dir, 'plot_sector_30d.png'), dpi=300)
-        plt.close()
+        fig.clf()
+        fig.set_size_inches(12, 8)
+        ax = fig.add_subplot()
+        sns.barplot(x=l_rets.values, y=l_rets.index, ax=ax)
+        ax.set_title(f'Sector 30d Returns ({last["Date"].date()})')
+        fig.tight_layout()
+        fig.savefig(os.path.join(plot_dir, 'plot_sector_30d.png'), dpi=300)
+    plt.close(fig)
         
-    # corr matrix
+    # corr matrix, its own figure at its own size
     r_cols = [c for c in df.columns if '_Return' in c]
     if r_cols:
         c = df[r_cols].corr()
-        plt.figure(figsize=(12, 10))
-        sns.heatmap(c, annot=True, cmap='coolwarm', fmt=".2f")
-        plt.title('Sector Return Correlation')
-        plt.tight_layout()
-        plt.savefig(os.path.join(plot_dir, 'plot_corr_matrix.png'), dpi=300)
-        plt.close()
+        fig, ax = plt.subplots(figsize=(12, 10))
+        sns.heatmap(c, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+        ax.set_title('Sector Return Correlation')
+        fig.tight_layout()
+        fig.savefig(os.path.join(plot_dir, 'plot_corr_matrix.png'), dpi=300)
+        plt.close(fig)
 
 def main():
     # run it all
@@ -255,27 +303,33 @@ def main():
     print("\ndiagnostics:")
     print(f"rows: {len(data)}")
     
-    # rolling corr
+    # rolling corr, every sector against nifty 50 in one numpy pass
     if 'NIFTY_50_Return' in data.columns:
         print("\ncalc rolling corr...")
-        for c in data.columns:
-            if '_Return' in c and c != 'NIFTY_50_Return':
-                s = c.replace('_Return', '')
-                data[f'{s}_Corr_30d'] = data[c].rolling(30).corr(data['NIFTY_50_Return'])
+        r_cols = [c for c in data.columns if '_Return' in c and c != 'NIFTY_50_Return']
+        corr = rolling_corr(data[r_cols].to_numpy(), data['NIFTY_50_Return'].to_numpy(), 30)
+        names = [c.replace('_Return', '_Corr_30d') for c in r_cols]
+        # attach every corr column with one concat, not an insert per sector
+        data = pd.concat([data, pd.DataFrame(corr, index=data.index, columns=names)], axis=1)
 
-    # drawdown
+    # drawdown on the raw array; fmax skips nan gaps the way cummax does
     if 'NIFTY_50_Close' in data.columns:
-        rmax = data['NIFTY_50_Close'].cummax()
-        dd = (data['NIFTY_50_Close'] - rmax) / rmax
-        print(f"\nmax dd: {dd.min():.2%} on {data.loc[dd.idxmin(), 'Date'].date()}")
+        close = data['NIFTY_50_Close'].to_numpy(dtype=np.float64)
+        rmax = np.fmax.accumulate(close)
+        dd = (close - rmax) / rmax
+        i = np.nanargmin(dd)
+        print(f"\nmax dd: {dd[i]:.2%} on {data['Date'].iloc[i].date()}")
         
-    # regimes
-    data['Risk_Regime'] = pd.cut(data['Risk_Score_v2'], 
-                               bins=[-np.inf, 40, 60, np.inf], 
-                               labels=['Low', 'Medium', 'High'])
+    # regimes: (-inf, 40] low, (40, 60] medium, (60, inf) high, same bins as
+    # pd.cut but straight to category codes. nan scores get code -1 (nan)
+    score = data['Risk_Score_v2'].to_numpy()
+    codes = np.searchsorted([40.0, 60.0], score, side='left')
+    codes[np.isnan(score)] = -1
+    data['Risk_Regime'] = pd.Categorical.from_codes(codes, categories=['Low', 'Medium', 'High'], ordered=True)
     
     data.to_csv(os.path.join(out_dir, final_file), index=False)
-    print(f"\nsaved {final_file}")
+    data.to_parquet(os.path.join(out_dir, final_pq), engine='pyarrow', index=False)
+    print(f"\nsaved {final_file} and {final_pq}")
     
     make_charts(data)
     print("done.")
@@ -1,8 +1,12 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from _stats import rolling_beta
+from _cache import load_closes
+from _plot import headless
+
+headless()
 
 def get_data():
     ticks = {
@@ -16,32 +20,18 @@ def get_data():
     
     print("fetching data...")
     try:
-        df = yf.download(list(ticks.values()), start='2015-01-01', end='2025-11-28', progress=False)
-        
-        if isinstance(df.columns, pd.MultiIndex):
-            try:
-                df = df['Adj Close']
-            except:
-                df = df['Close']
-                
-        inv = {v: k for k, v in ticks.items()}
-        df.rename(columns=inv, inplace=True)
-        df.dropna(inplace=True)
-        return df
+        # cached per ticker, only the missing tail is downloaded
+        return load_closes(ticks, '2015-01-01', '2025-11-28').dropna()
     except:
         return pd.DataFrame()
 
 def calc_beta(df, win=30):
     rets = df.pct_change().dropna()
-    mkt = rets['NIFTY 50']
-    mkt_var = mkt.rolling(win).var()
-    
-    betas = pd.DataFrame(index=rets.index)
+    secs = [c for c in ['IT', 'BANK', 'FMCG', 'AUTO', 'METAL'] if c in rets.columns]
     
-    for c in ['IT', 'BANK', 'FMCG', 'AUTO', 'METAL']:
-        if c in rets.columns:
-            cov = rets[c].rolling(win).cov(mkt)
-            betas[c] = cov / mkt_var
+    # every sector's cov / market var in one matrix pass
+    b = rolling_beta(rets[secs].to_numpy(), rets['NIFTY 50'].to_numpy(), win)
+    betas = pd.DataFrame(b, index=rets.index, columns=secs)
             
     return betas.dropna()
 
@@ -1,8 +1,11 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
+from _cache import load_closes, last_session_end
+from _plot import headless
+
+headless()
 
 def get_data():
     ticks = {
@@ -20,25 +23,22 @@ def get_data():
     
     print("fetching data...")
     try:
-        df = yf.download(list(ticks.values()), period="2y", progress=False)
-        
-        if isinstance(df.columns, pd.MultiIndex):
-            try:
-                df = df['Adj Close']
-            except:
-                df = df['Close']
-                
-        inv = {v: k for k, v in ticks.items()}
-        df.rename(columns=inv, inplace=True)
-        df.dropna(inplace=True)
-        return df
+        # last 2 years up to the last completed session
+        start = pd.Timestamp.today().normalize() - pd.DateOffset(years=2)
+        df = load_closes(ticks, start.date().isoformat(), last_session_end())
+        return df.dropna()
     except:
         return pd.DataFrame()
 
 def get_corr(df):
-    rets = df.pct_change().dropna()
-    c = rets.corr()
-    return c
+    # returns + pearson matrix in numpy, labels only go back on at the end
+    a = df.to_numpy(dtype=np.float64)
+    r = (a[1:] - a[:-1]) / a[:-1]
+    r = r[~np.isnan(r).any(axis=1)]
+    # z-score the ~10 columns and take one gemm, no corrcoef cov/outer/divide steps
+    z = (r - r.mean(axis=0)) / r.std(axis=0, ddof=1)
+    c = z.T @ z / (len(r) - 1)
+    return pd.DataFrame(c, index=df.columns, columns=df.columns)
 
 def draw_plot(c):
     plt.figure(figsize=(10, 10), dpi=300)
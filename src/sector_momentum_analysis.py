@@ -1,10 +1,13 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.colors import LinearSegmentedColormap
 import matplotlib.ticker as mtick
+from _cache import load_closes
+from _plot import headless
+
+headless()
 
 def get_data():
     ticks = {
@@ -23,17 +26,8 @@ def get_data():
     
     print("fetching data...")
     try:
-        df = yf.download(list(ticks.values()), start='2025-09-01', end='2025-11-20', progress=False)
-        
-        if isinstance(df.columns, pd.MultiIndex):
-            try:
-                df = df['Adj Close']
-            except:
-                df = df['Close']
-                
-        inv = {v: k for k, v in ticks.items()}
-        df.rename(columns=inv, inplace=True)
-        return df
+        # cached per ticker, only the missing tail is downloaded
+        return load_closes(ticks, '2025-09-01', '2025-11-20')
     except:
         return pd.DataFrame()
 
@@ -42,14 +36,18 @@ def get_mom(df):
     s_date = t_date - pd.Timedelta(days=30)
     
     try:
-        e_idx = df.index.get_indexer([t_date], method='nearest')[0]
-        s_idx = df.index.get_indexer([s_date], method='nearest')[0]
-        
-        e_p = df.iloc[e_idx]
-        s_p = df.iloc[s_idx]
+        # nearest trading day to both dates with one searchsorted on the
+        # sorted index: take the neighbour before unless the one after is
+        # at least as close (ties go later, like get_indexer 'nearest')
+        idx = df.index.to_numpy()
+        want = np.array([s_date, t_date], dtype=idx.dtype)
+        hi = np.minimum(np.searchsorted(idx, want), len(idx) - 1)
+        lo = np.maximum(hi - 1, 0)
+        pick = np.where(want - idx[lo] < idx[hi] - want, lo, hi)
         
-        ret = (e_p - s_p) / s_p
-        return ret
+        p = df.to_numpy()
+        s_p, e_p = p[pick[0]], p[pick[1]]
+        return pd.Series((e_p - s_p) / s_p, index=df.columns)
     except:
         return pd.Series()
 